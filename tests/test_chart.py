@@ -0,0 +1,53 @@
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import v6
+
+
+class HeadlessCanvas(FigureCanvasAgg):
+    # Mesma interface usada pelo StripChart, sem precisar de Tk
+    def __init__(self, figure, master=None):
+        super().__init__(figure)
+
+
+@pytest.fixture
+def chart(monkeypatch):
+    monkeypatch.setattr(v6, "FigureCanvasTkAgg", HeadlessCanvas)
+    return v6.StripChart(None)
+
+
+def test_error_panel_ignores_samples_without_setpoint(chart):
+    # Setpoint 0 até o primeiro SET: o erro não pode levar a escala para ~-25 °C
+    for i in range(10):
+        chart.append(i * 0.5, 25.0, 0.0, 0.0, 0.0, 0)
+    for i in range(10, 20):
+        chart.append(i * 0.5, 30.0 + (0.3 if i % 2 else -0.3), 30.0, 6.0, 0.0, 0)
+    chart.refresh()
+
+    assert chart._ylim["erro"] == (-1, 1)
+    assert chart.axes["erro"].get_ylim() == (-1, 1)
+    assert all(v != v for v in chart.series["erro"][:10])  # NaN: trecho em branco
+
+
+def test_rpm_scale_stays_at_default_while_fan_is_still(chart):
+    for i in range(20):
+        chart.append(i * 0.5, 25.0, 30.0, 12.0, 0.0, 0)
+    chart.refresh()
+    assert chart._ylim["rpm"] == (0, 100)
+
+    chart.append(10.0, 25.0, 30.0, 12.0, 12.0, 1500)
+    assert chart._ylim["rpm"] == (0, 1600)
+
+
+def test_buffers_are_decimated_past_max_points(chart):
+    n = 3 * v6.CHART_MAX_POINTS
+    for i in range(n):
+        chart.append(i * 0.1, 25.0 + i * 1e-4, 30.0, 6.0, 0.0, 0)
+
+    assert len(chart.x) <= v6.CHART_MAX_POINTS
+    assert chart._stride == 4
+    assert all(len(buf) == len(chart.x) for buf in chart.series.values())
+    assert chart.x[0] == 0.0 and chart.x == sorted(chart.x)
+    # A escala de tempo acompanha todas as amostras, mesmo as descartadas
+    assert chart._xlim >= (n - 1) * 0.1
+    chart.refresh()
@@ -0,0 +1,96 @@
+import types
+
+import v6
+
+
+class FakeButton:
+    def __init__(self):
+        self.text = None
+
+    def configure(self, **kw):
+        self.text = kw.get("text", self.text)
+
+
+def make_app(setpoint=35.0, board_millis=60000, gap=1.0):
+    # Stub com o estado de uma sessão que acabou de reabrir a porta
+    app = types.SimpleNamespace(sent=[], active_setpoint=setpoint, active_mode=0, base_heat_confirmed=False,
+                                board_millis=board_millis, next_event_marker="", btn_connect=FakeButton(),
+                                is_connected=True, serial_port=object(), connected_device=None,
+                                com_port_var=types.SimpleNamespace(set=lambda v: None))
+
+    def send_command(cmd):
+        app.sent.append(cmd)
+        return True
+
+    app.send_command = send_command
+    app.send_disturbance = lambda: send_command("DIST:0.0")
+    app.validate_and_send_pid = lambda: send_command("PID:40.0:1.0:10.0")
+    app.finish_resync = lambda: v6.ThermalControlApp.finish_resync(app)
+    app.add_event_marker = lambda text: v6.ThermalControlApp.add_event_marker(app, text)
+    v6.ThermalControlApp.resync_after_reconnect(app, "/dev/ttyACM0", gap)
+    return app
+
+
+def frame(app, setpoint, millis):
+    v6.ThermalControlApp.check_resync(app, setpoint, millis)
+    app.board_millis = millis
+
+
+def test_nothing_is_sent_before_the_first_frame():
+    app = make_app()
+    assert app.sent == []
+    assert app.resync is not None
+    assert app.btn_connect.text == "RESSINCRONIZANDO..."
+
+
+def test_short_glitch_keeps_the_integral():
+    app = make_app(gap=0.8)
+    frame(app, 35.0, 61000)
+    assert app.sent == []  # Nada de MODE/PID: a placa seguiu rodando
+    assert app.resync is None
+    assert app.next_event_marker == "RECONEXÃO (lacuna 0.8 s)"
+
+
+def test_gap_past_watchdog_only_rearms_with_set():
+    app = make_app(gap=2.5)
+    frame(app, 35.0, 63000)
+    assert app.sent == ["SET:35.0"]
+    assert app.resync is None
+
+
+def test_board_reset_resends_until_setpoint_is_back(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(v6.time, "time", lambda: now[0])
+    app = make_app(gap=4.0)
+
+    frame(app, 0.0, 900)  # millis voltou: power cycle
+    full = ["MODE:0", "DIST:0.0", "PID:40.0:1.0:10.0", "SET:35.0"]
+    assert app.sent == full
+
+    # Comandos perdidos: a telemetria ainda mostra 0; espera RESYNC_RETRY antes de reenviar
+    now[0] += v6.RESYNC_RETRY / 2
+    frame(app, 0.0, 1400)
+    assert app.sent == full
+    now[0] += v6.RESYNC_RETRY
+    frame(app, 0.0, 1900)
+    assert app.sent == full * 2
+
+    frame(app, 35.0, 2400)
+    assert app.sent == full * 2
+    assert app.resync is None
+    assert app.next_event_marker == "RECONEXÃO (lacuna 4.0 s, placa reiniciada)"
+
+
+def test_setpoint_mismatch_without_reset_resends():
+    app = make_app()
+    frame(app, 20.0, 61000)
+    assert app.sent[0] == "MODE:0"
+    assert app.resync is not None
+
+
+def test_stopped_session_does_not_resync():
+    app = make_app()
+    app.is_connected = False
+    app.resync = None
+    v6.ThermalControlApp.resync_after_reconnect(app, "/dev/ttyACM0", 1.0)
+    assert app.resync is None
@@ -0,0 +1,89 @@
+import types
+from collections import deque
+
+import v6
+
+
+class FakeWidget:
+    # Fila de 'after' executada à mão: cada run() é um quadro
+    def __init__(self):
+        self.jobs = []
+
+    def after(self, ms, fn):
+        self.jobs.append((ms, fn))
+        return len(self.jobs)
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for _, fn in jobs:
+            fn()
+
+
+def make_scheduler():
+    widget = FakeWidget()
+    sched = v6.RenderScheduler(widget, fps=20)
+    calls = []
+    shown = {"cards": True, "table": False}
+    for name in shown:
+        sched.register(name, lambda n=name: calls.append(n), lambda n=name: shown[n])
+    return widget, sched, calls, shown
+
+
+def test_marks_coalesce_into_one_frame():
+    widget, sched, calls, _ = make_scheduler()
+    for _ in range(10):
+        sched.mark("cards")
+    assert [ms for ms, _ in widget.jobs] == [50]
+    widget.run()
+    assert calls == ["cards"]
+    assert widget.jobs == []  # Nada sujo, nenhum quadro novo
+
+
+def test_hidden_tab_stays_dirty_until_wake():
+    widget, sched, calls, shown = make_scheduler()
+    sched.mark("cards")
+    sched.mark("table")
+    widget.run()
+    assert calls == ["cards"]
+    assert sched.dirty == {"table"}
+
+    shown["table"] = True
+    sched.wake()
+    widget.run()
+    assert calls == ["cards", "table"]
+    assert sched.dirty == set()
+
+
+def test_discard_drops_pending_render():
+    widget, sched, calls, _ = make_scheduler()
+    sched.mark("cards")
+    sched.discard("cards")
+    widget.run()
+    assert calls == []
+
+
+class FakeTree:
+    def __init__(self):
+        self.rows = []
+
+    def insert(self, parent, index, values):
+        self.rows.insert(int(index), values)
+
+
+def test_render_table_remarks_until_queue_is_drained():
+    widget = FakeWidget()
+    app = types.SimpleNamespace(tree=FakeTree(), tracer=v6.SampleTracer(16), trace_sample=0,
+                                pending_rows=deque(range(2 * v6.RENDER_MAX_ROWS + 10)))
+    app.render = v6.RenderScheduler(widget)
+    app.render.register("table", lambda: v6.ThermalControlApp.render_table(app))
+    app.render.mark("table")
+
+    frames = 0
+    while widget.jobs:
+        widget.run()
+        frames += 1
+        assert len(app.tree.rows) <= frames * v6.RENDER_MAX_ROWS
+
+    assert frames == 3
+    assert not app.pending_rows
+    assert app.tree.rows[0] == 2 * v6.RENDER_MAX_ROWS + 9  # Mais recente no topo
@@ -0,0 +1,132 @@
+import types
+
+import v6
+
+
+class FakeWidget:
+    def __init__(self):
+        self.cfg = {}
+
+    def configure(self, **kw):
+        self.cfg.update(kw)
+
+
+class FakeReplay:
+    def __init__(self):
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def summary(self):
+        return "resumo"
+
+
+def make_app(replay=None, serial_port=None):
+    widgets = ("btn_connect", "btn_replay", "entry_setpoint", "entry_interval", "mode_menu",
+               "entry_base_heat", "btn_conf_base", "btn_set", "btn_save_excel", "btn_save_img")
+    app = types.SimpleNamespace(replay=replay, serial_port=serial_port, is_connected=serial_port is not None,
+                                monitoring=True, active_mode=0, full_data_log=[], alerts=[],
+                                **{name: FakeWidget() for name in widgets})
+    app.send_stop_now = lambda: None
+    app.show_alert = lambda title, msg, error: app.alerts.append(title)
+    app.close_serial = lambda: v6.ThermalControlApp.close_serial(app)
+    return app
+
+
+def test_stopping_a_replay_keeps_connect_disabled_until_it_drains():
+    app = make_app(replay=FakeReplay())
+    v6.ThermalControlApp.stop_all_monitoring(app)
+    assert app.replay.stopped
+    assert app.btn_connect.cfg["state"] == "disabled"
+
+    # A thread ainda drena: CONECTAR não abre a porta
+    v6.ThermalControlApp.toggle_connection(app)
+    assert app.serial_port is None
+
+    v6.ThermalControlApp.finish_replay(app)
+    assert app.replay is None
+    assert app.btn_connect.cfg["state"] == "normal"
+    assert app.btn_replay.cfg["text"] == "REPRODUZIR"
+
+
+def test_finish_replay_leaves_an_open_port_alone():
+    class Port:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    port = Port()
+    app = make_app(replay=FakeReplay(), serial_port=port)
+    v6.ThermalControlApp.finish_replay(app)
+    assert app.serial_port is port and not port.closed
+    assert app.is_connected
+    assert "state" not in app.btn_connect.cfg
+
+
+def test_event_markers_merge_without_duplicates():
+    app = types.SimpleNamespace(next_event_marker="")
+    add = lambda text: v6.ThermalControlApp.add_event_marker(app, text)
+
+    add("INICIO (Set: 35.0)")
+    add("RECONEXÃO (lacuna 1.0 s)")
+    assert app.next_event_marker == "INICIO (Set: 35.0) | RECONEXÃO (lacuna 1.0 s)"
+
+    # Linha de alarme gravada que dispara a mesma regra de novo no replay
+    app.next_event_marker = ""
+    add("ALARME: Sobretemperatura: 55.0 °C")
+    add("ALARME: Sobretemperatura: 55.0 °C")
+    assert app.next_event_marker == "ALARME: Sobretemperatura: 55.0 °C"
+
+
+# --- Leitura de sessões gravadas ---
+
+def test_capture_offsets_millis_reset(tmp_path):
+    path = tmp_path / "captura.txt"
+    path.write_text("Porta aberta\n"
+                    "DADOS,25.0,30.0,100,0,10000,0\n"
+                    "DADOS,25.1,30.0,100,0,10500,0\n"
+                    "lixo\n"
+                    "DADOS,25.2,0.0,0,0,400,0\n"  # placa resetou
+                    "DADOS,25.3,0.0,0,0,900,0\n", encoding="utf-8")
+    replay = v6.SessionReplay.from_file(str(path))
+    assert [t for t, _, _ in replay.frames] == [0.0, 0.5, 0.9, 1.4]
+    assert all(event is None for _, _, event in replay.frames)
+    assert replay.frames[2][1] == "DADOS,25.2,0.0,0,0,400,0"
+
+
+def test_ptbr_csv_with_semicolons_and_decimal_commas(tmp_path):
+    path = tmp_path / "sessao.csv"
+    path.write_text("Tempo (s);Temperatura (°C);Setpoint (°C);Tensão Lâmpada (V);Tensão Fan (V);RPM;Eventos\n"
+                    "0,5;25,4;30,0;6,0;0,0;0;INICIO (Set: 30.0)\n"
+                    "1,5;25,9;30,0;12,0;0,0;0;-\n", encoding="utf-8")
+    replay = v6.SessionReplay.from_file(str(path))
+    assert replay.frames == [(0.5, "DADOS,25.4,30.0,128,0,500,0", "INICIO (Set: 30.0)"),
+                             (1.5, "DADOS,25.9,30.0,255,0,1500,0", None)]
+
+
+def test_xlsx_exported_in_heat_only_mode(tmp_path):
+    # Modo 1 exporta sem as colunas de ventoinha e RPM
+    path = tmp_path / "sessao.xlsx"
+    v6.pd.DataFrame({"Tempo (s)": [0.0, 1.0], "Temperatura (°C)": [25.0, 25.5], "Setpoint (°C)": [30.0, 30.0],
+                     "Tensão Lâmpada (V)": [12.0, 3.0], "Eventos": ["INICIO (Set: 30.0)", "-"],
+                     "Data/Hora": ["2026-01-01 10:00:00", "2026-01-01 10:00:01"]}).to_excel(path, index=False)
+    replay = v6.SessionReplay.from_file(str(path))
+    assert [line for _, line, _ in replay.frames] == ["DADOS,25.0,30.0,255,0,0,0", "DADOS,25.5,30.0,64,0,1000,0"]
+
+
+def test_events_are_extracted_and_blanks_ignored():
+    df = v6.pd.DataFrame({"Tempo (s)": [0.0, 1.0, 2.0, 3.0], "Temperatura (°C)": [25.0] * 4,
+                          "Eventos": ["INICIO (Set: 30.0)", "-", None, "ALARME: Sobretemperatura: 55.0 °C"]})
+    events = [event for _, _, event in v6.SessionReplay._frames_from_table(df)]
+    assert events == ["INICIO (Set: 30.0)", None, None, "ALARME: Sobretemperatura: 55.0 °C"]
+
+
+def test_table_without_required_columns_is_rejected():
+    try:
+        v6.SessionReplay._frames_from_table(v6.pd.DataFrame({"Hora": [1]}))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("esperava ValueError")
@@ -0,0 +1,180 @@
+import time
+import types
+
+import v6
+
+# Pior caso aceito entre a chegada da linha e o STOP escrito na porta
+TRIP_LATENCY_BOUND = 0.010  # s
+
+
+def feed(monitor, samples, dt=0.5, t0=0.0):
+    """Avalia (temp, setpoint, lamp, fan, rpm) a cada dt e devolve [(t, alarmes)] dos disparos."""
+    trips = []
+    for i, sample in enumerate(samples):
+        t = t0 + i * dt
+        alarms = monitor.evaluate(t, *sample)
+        if alarms:
+            trips.append((t, alarms))
+    return trips
+
+
+# --- Regras ---
+
+def test_overtemp_trips_once_and_rearms_below_hysteresis():
+    m = v6.SafetyMonitor()
+    assert m.evaluate(0, 49.9, 30, 100, 0, 0) == []
+    assert m.evaluate(1, 50.0, 30, 100, 0, 0) == ["Sobretemperatura: 50.0 °C"]
+    assert m.evaluate(2, 51.0, 30, 100, 0, 0) == []  # travado, não repete
+    assert m.evaluate(3, 47.5, 30, 0, 0, 0) == []  # ainda dentro da histerese
+    assert m.evaluate(4, 50.0, 30, 0, 0, 0) == []
+    assert m.evaluate(5, 46.9, 30, 0, 0, 0) == []  # rearma
+    assert m.evaluate(6, 50.0, 30, 0, 0, 0) == ["Sobretemperatura: 50.0 °C"]
+
+
+def test_negative_disturbance_does_not_hide_overtemp():
+    # Telemetria = sensor + distúrbio: 45 °C com distúrbio -5 é o sensor a 50 °C
+    m = v6.SafetyMonitor()
+    assert m.evaluate(0, 45.0, 30, 100, 0, 0, disturbance=-5.0) == ["Sobretemperatura: 50.0 °C"]
+
+
+def test_positive_disturbance_does_not_cause_false_overtemp():
+    m = v6.SafetyMonitor()
+    assert m.evaluate(0, 52.0, 30, 100, 0, 0, disturbance=5.0) == []
+
+
+def test_disturbance_step_is_not_a_temperature_rise():
+    # Mudar o distúrbio mexe na telemetria, mas não aquece nada
+    m = v6.SafetyMonitor()
+    sat = m.cfg["lamp_sat_time"]
+    assert m.evaluate(0, 25.0, 35.0, 255, 0, 0) == []
+    assert m.evaluate(sat / 2, 27.0, 35.0, 255, 0, 0, disturbance=2.0) == []
+    assert m.evaluate(sat, 27.0, 35.0, 255, 0, 0, disturbance=2.0) != []
+
+
+def test_stuck_sensor_does_not_trip_while_holding_setpoint():
+    # DHT11 parado no setpoint com a lâmpada ligada é operação normal
+    m = v6.SafetyMonitor()
+    assert feed(m, [(30.0, 30.5, 90, 0, 0)] * 2000) == []
+
+
+def test_stuck_sensor_trips_when_driving_and_rearms_on_change():
+    m = v6.SafetyMonitor()
+    stuck = m.cfg["stuck_time"]
+    n = int(stuck / 0.5) + 1
+    trips = feed(m, [(25.0, 35.0, 200, 0, 0)] * (n + 10))
+    assert [t for t, _ in trips] == [stuck]
+    assert trips[0][1][0].startswith("Sensor travado em 25.0 °C")
+
+    # Leitura mudou: rearma e volta a contar do zero
+    assert m.evaluate(1000, 26.0, 35.0, 200, 0, 0) == []
+    assert "sensor" not in m.tripped
+    assert m.evaluate(1000 + stuck - 1, 26.0, 35.0, 200, 0, 0) == []
+    assert m.evaluate(1000 + stuck, 26.0, 35.0, 200, 0, 0) != []
+
+
+def test_stuck_sensor_timer_resets_when_not_driving():
+    m = v6.SafetyMonitor()
+    stuck = m.cfg["stuck_time"]
+    assert m.evaluate(0, 25.0, 35.0, 200, 0, 0) == []
+    assert m.evaluate(stuck - 1, 25.0, 35.0, 200, 0, 0) == []
+    assert m.evaluate(stuck - 0.5, 25.0, 25.5, 200, 0, 0) == []  # erro pequeno: zera o tempo
+    assert m.evaluate(stuck, 25.0, 35.0, 200, 0, 0) == []
+    assert m.evaluate(2 * stuck - 1, 25.0, 35.0, 200, 0, 0) == []
+
+
+def test_fan_stall_trips_after_grace_and_rearms_when_spinning():
+    m = v6.SafetyMonitor()
+    trips = feed(m, [(30.0, 25.0, 0, 200, 0)] * 10)
+    assert [t for t, _ in trips] == [m.cfg["fan_stall_time"]]
+
+    assert m.evaluate(10, 30.0, 25.0, 0, 200, 1200) == []  # girando: rearma
+    assert "ventoinha" not in m.tripped
+    assert feed(m, [(30.0, 25.0, 0, 200, 0)] * 10, t0=20) != []
+
+
+def test_fan_below_min_pwm_is_not_a_stall():
+    m = v6.SafetyMonitor()
+    assert feed(m, [(30.0, 25.0, 0, m.cfg["fan_min_pwm"] - 1, 0)] * 100) == []
+
+
+def test_lamp_saturation_without_rise_trips_and_rearms():
+    m = v6.SafetyMonitor()
+    sat = m.cfg["lamp_sat_time"]
+    trips = feed(m, [(25.0, 35.0, 255, 0, 0)] * (int(sat / 0.5) + 5))
+    assert [t for t, _ in trips] == [sat]
+
+    assert m.evaluate(200, 25.0, 35.0, 100, 0, 0) == []  # saiu da saturação
+    assert "lampada" not in m.tripped
+
+
+def test_lamp_saturation_with_rising_temperature_is_fine():
+    m = v6.SafetyMonitor()
+    samples = [(25.0 + i * 0.01, 35.0, 255, 0, 0) for i in range(1000)]  # +0.5 °C a cada 25 s
+    assert feed(m, samples) == []
+
+
+def test_lamp_saturation_ignored_in_fan_only_mode():
+    m = v6.SafetyMonitor()
+    m.mode = 2  # lâmpada fixa na base de propósito
+    assert feed(m, [(30.0, 28.0, 255, 0, 1000)] * 1000) == []
+
+
+# --- Latência do STOP no caminho de leitura ---
+
+class FakePort:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append((time.perf_counter(), data))
+
+
+def make_app():
+    # Só o que ingest_line usa; métodos reais do app ligados ao stub
+    app = types.SimpleNamespace(serial_port=FakePort(), safety=v6.SafetyMonitor(),
+                                tracer=v6.SampleTracer(16), queued=[], active_disturbance=0.0)
+    app.after = lambda ms, fn, *args: app.queued.append((fn, args))
+    app.process_data = lambda *args: None
+    app.parse_frame = lambda data: v6.ThermalControlApp.parse_frame(app, data)
+    app.send_stop_now = lambda: v6.ThermalControlApp.send_stop_now(app)
+    return app
+
+
+def test_normal_frame_sends_nothing():
+    app = make_app()
+    v6.ThermalControlApp.ingest_line(app, "DADOS,30.0,30.0,100,0,1000,0")
+    assert app.serial_port.writes == []
+    assert len(app.queued) == 1
+    assert app.queued[0][1][3] == []  # sem alarmes para a interface
+
+
+def test_trip_writes_stop_in_the_same_frame_before_ui_work():
+    app = make_app()
+    v6.ThermalControlApp.ingest_line(app, "DADOS,30.0,30.0,100,0,1000,0")
+    v6.ThermalControlApp.ingest_line(app, "DADOS,55.0,30.0,255,0,1500,0")
+
+    assert [data for _, data in app.serial_port.writes] == [b"STOP\n"]
+    # A amostra que disparou ainda está na fila da interface, já com o alarme
+    assert len(app.queued) == 2
+    assert app.queued[1][1][3] == ["Sobretemperatura: 55.0 °C"]
+
+
+def test_ingest_uses_sensor_reading_without_disturbance():
+    app = make_app()
+    app.active_disturbance = -5.0
+    v6.ThermalControlApp.ingest_line(app, "DADOS,45.0,30.0,100,0,1000,0")
+    assert [data for _, data in app.serial_port.writes] == [b"STOP\n"]
+
+
+def test_worst_case_trip_latency():
+    app = make_app()
+    worst = 0.0
+    for i in range(2000):
+        app.safety.reset()
+        app.serial_port.writes.clear()
+        t0 = time.perf_counter()
+        v6.ThermalControlApp.ingest_line(app, f"DADOS,55.0,30.0,255,0,{i},0")
+        (t_stop, data), = app.serial_port.writes
+        assert data == b"STOP\n"
+        worst = max(worst, t_stop - t0)
+    assert worst < TRIP_LATENCY_BOUND, f"pior latência {worst * 1000:.2f} ms"
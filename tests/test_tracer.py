@@ -0,0 +1,27 @@
+import json
+
+import v6
+
+
+def test_summary_ranks_stages_but_not_group_spans(tmp_path):
+    tr = v6.SampleTracer(64)
+    tr.enabled = True
+    t0 = 1_000_000
+    tr.record("process_data", 1, t0)  # englobante: seria sempre a "mais lenta"
+    tr.record("update_cards", 1, t0)
+
+    summary = tr.summary()
+    assert "update_cards" in summary
+    assert "process_data" not in summary
+
+    # O trace exportado mantém todos os spans
+    path = tmp_path / "trace.json"
+    tr.export_chrome(path)
+    names = {e["name"] for e in json.loads(path.read_text())["traceEvents"] if e["ph"] == "X"}
+    assert names == {"process_data", "update_cards"}
+
+
+def test_disabled_tracer_records_nothing():
+    tr = v6.SampleTracer(8)
+    tr.record("parse", tr.next_sample(), tr.now())
+    assert tr.spans() == []
@@ -3,6 +3,11 @@ import serial
 import serial.tools.list_ports
 import threading
 import time
+import os
+import io
+import json
+import itertools
+from collections import deque
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
@@ -32,9 +37,591 @@ COLOR_SUCCESS = "#2cc985"
 COLOR_WARNING = "#e67e22"
 COLOR_DANGER = "#c0392b"
 
+CONTROL_MODES = {"Automático (Ambos)": 0, "Só Aquecimento": 1, "Só Ventilação": 2}
+
+# Placas reconhecidas por (VID, PID); PID None = qualquer produto do fabricante
+ARDUINO_USB_IDS = [
+    (0x2341, None),  # Arduino
+    (0x2A03, None),  # Arduino.org
+    (0x1A86, 0x7523),  # CH340
+    (0x0403, 0x6001),  # FTDI
+]
+RECONNECT_POLL = 0.5  # s entre buscas pela placa depois de uma queda do USB
+HEARTBEAT_INTERVAL = 1.0  # s entre PINGs para o watchdog do firmware
+FIRMWARE_WATCHDOG = 3.0  # s sem comandos até o firmware desligar as saídas (WATCHDOG_TIMEOUT)
+RESYNC_RETRY = 1.0  # s entre reenvios enquanto a telemetria não mostra o setpoint de volta
+RESYNC_SETPOINT_TOL = 0.06  # O firmware manda o setpoint com 1 casa decimal
+
+# Folga na comparação do intervalo de gravação (o 'Tempo (s)' exportado tem 2 casas)
+LOG_INTERVAL_TOLERANCE = 0.01
+
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("dark-blue")
 
+# --- GRÁFICO MULTICANAL ---
+# Painéis empilhados (de cima para baixo) com eixo de tempo compartilhado.
+# "ylim" é a escala inicial, "margin" a folga ao expandir (None = escala fixa) e
+# "tight" faz a primeira amostra substituir a escala inicial.
+CHART_PANELS = [
+    {"key": "temp", "label": "Temp (°C)", "ratio": 3, "ylim": (20, 30), "margin": 1.0, "tight": True,
+     "series": [("temp", "Temp", "main"), ("set", "Set", "ref")]},
+    {"key": "erro", "label": "Erro (°C)", "ratio": 1, "ylim": (-1, 1), "margin": 0.5, "tight": False,
+     "series": [("erro", "Erro", "error")]},
+    {"key": "tensao", "label": "Tensão (V)", "ratio": 1.5, "ylim": (0, 12.5), "margin": None, "tight": False,
+     "series": [("lamp_v", "Lâmpada", "lamp"), ("fan_v", "Fan", "fan")]},
+    {"key": "rpm", "label": "RPM", "ratio": 1, "ylim": (0, 100), "margin": 100, "tight": False,
+     "series": [("rpm", "RPM", "rpm")]},
+]
+
+# Canais escondidos por modo (mesma regra da tabela: Só Aquecimento não tem Fan/RPM)
+CHART_HIDDEN_BY_MODE = {1: ("fan_v", "rpm")}
+
+CHART_X_SPAN = 60.0  # Janela inicial do eixo de tempo (s)
+CHART_MAX_POINTS = 3000  # Acima disso os buffers são dizimados pela metade
+
+
+class StripChart:
+    """Gráfico de tira: temperatura, erro, tensões e RPM em painéis com o mesmo eixo de tempo.
+
+    As linhas são artistas animados redesenhados por blit sobre um fundo em cache.
+    O redesenho completo só acontece quando uma escala precisa crescer, e os buffers
+    são dizimados ao passar de CHART_MAX_POINTS, então o custo por quadro não cresce
+    com a duração do ensaio.
+    """
+
+    def __init__(self, master):
+        self.fig = Figure(figsize=(5, 4), dpi=100)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+        self.colors = THEME_CFG["Dark"]
+        self.mode = 0
+        self.axes = {}
+        self.lines = {}
+        self.line_styles = {}
+        self._background = None
+
+        self.reset()
+        self._build()
+
+    def reset(self):
+        self.x = []
+        self.series = {name: [] for panel in CHART_PANELS for name, _, _ in panel["series"]}
+        self._stride = 1  # Guarda 1 a cada N amostras (dobra a cada dizimação)
+        self._pending = 0
+        self._xlim = CHART_X_SPAN
+        self._ylim = {panel["key"]: None for panel in CHART_PANELS}
+        self._limits_dirty = True
+
+    def set_mode(self, mode):
+        if mode != self.mode:
+            self.mode = mode
+            self._build()
+
+    def append(self, t, temp, setpoint, lamp_v, fan_v, rpm):
+        # O firmware informa setpoint 0.0 até o primeiro SET: sem setpoint, Set e Erro ficam
+        # em branco (NaN) e fora das escalas, senão o painel de erro fica preso em ~-25 °C
+        has_setpoint = setpoint > 0
+        nan = float("nan")
+        values = {"temp": temp, "set": setpoint if has_setpoint else nan,
+                  "erro": setpoint - temp if has_setpoint else nan,
+                  "lamp_v": lamp_v, "fan_v": fan_v, "rpm": rpm}
+
+        # As escalas consideram todas as amostras, mesmo as que a dizimação descarta
+        if t > self._xlim:
+            self._xlim = max(CHART_X_SPAN, t * 1.5)
+            self._limits_dirty = True
+        for panel in CHART_PANELS:
+            for name, _, _ in panel["series"]:
+                if values[name] == values[name]:  # NaN != NaN
+                    self._fit(panel, values[name])
+
+        self._pending += 1
+        if self._pending < self._stride:
+            return
+        self._pending = 0
+
+        self.x.append(t)
+        for name, buf in self.series.items():
+            buf.append(values[name])
+
+        if len(self.x) > CHART_MAX_POINTS:
+            for buf in (self.x, *self.series.values()):
+                del buf[1::2]
+            self._stride *= 2
+
+    def _fit(self, panel, value):
+        margin = panel["margin"]
+        if margin is None:
+            return
+        key = panel["key"]
+        lim = self._ylim[key]
+        if lim is None:
+            # Escala inicial; "tight" centraliza na primeira amostra
+            lim = (value, value) if panel["tight"] else panel["ylim"]
+            self._ylim[key] = lim
+            self._limits_dirty = True
+        if lim[0] <= value <= lim[1] and lim[0] < lim[1]:
+            return
+        self._ylim[key] = (min(lim[0], value - margin), max(lim[1], value + margin))
+        self._limits_dirty = True
+
+    def refresh(self):
+        self._sync_lines()
+        if self._limits_dirty or self._background is None:
+            # Redesenho completo; o _on_draw recaptura o fundo e desenha as linhas
+            self._apply_limits()
+            self.canvas.draw()
+            return
+
+        self.canvas.restore_region(self._background)
+        self._draw_lines()
+        self.canvas.blit(self.fig.bbox)
+
+    def apply_theme(self, colors):
+        self.colors = colors
+        self.fig.patch.set_facecolor(colors["panel"])
+        for name, line in self.lines.items():
+            line.set(**self._line_props(self.line_styles[name]))
+
+        for ax in self.axes.values():
+            ax.set_facecolor(colors["chart_bg"])
+            ax.spines['bottom'].set_color(colors["chart_axis"])
+            ax.spines['left'].set_color(colors["chart_axis"])
+            ax.tick_params(colors=colors["chart_axis"], labelsize=8)
+            ax.yaxis.label.set_color(colors["chart_axis"])
+            ax.xaxis.label.set_color(colors["chart_axis"])
+            ax.grid(True, linestyle=':', color=colors["chart_grid"], alpha=0.5)
+            if len(ax.get_lines()) > 1:
+                ax.legend(loc='upper right', facecolor=colors["panel"], labelcolor=colors["chart_axis"],
+                          framealpha=0, fontsize=8)
+
+        self._limits_dirty = True
+        self.refresh()
+
+    def save(self, filename):
+        # Artistas animados não entram no savefig; desliga a animação só para exportar
+        self._sync_lines()
+        for line in self.lines.values():
+            line.set_animated(False)
+        try:
+            self.fig.savefig(filename)
+        finally:
+            for line in self.lines.values():
+                line.set_animated(True)
+            self.canvas.draw()
+
+    def _build(self):
+        hidden = CHART_HIDDEN_BY_MODE.get(self.mode, ())
+        panels = [p for p in CHART_PANELS if any(name not in hidden for name, _, _ in p["series"])]
+
+        self.fig.clear()
+        self._background = None
+        self.axes = {}
+        self.lines = {}
+        self.line_styles = {}
+
+        axes = self.fig.subplots(len(panels), 1, sharex=True, squeeze=False,
+                                 gridspec_kw={"height_ratios": [p["ratio"] for p in panels]})[:, 0]
+        self.fig.subplots_adjust(left=0.07, right=0.98, top=0.98, bottom=0.08, hspace=0.12)
+
+        for ax, panel in zip(axes, panels):
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+            ax.set_ylabel(panel["label"], fontsize=9)
+            self.axes[panel["key"]] = ax
+            for name, label, style in panel["series"]:
+                if name in hidden:
+                    continue
+                line, = ax.plot([], [], label=label, animated=True, **self._line_props(style))
+                self.lines[name] = line
+                self.line_styles[name] = style
+        axes[-1].set_xlabel("Tempo (s)", fontsize=9)
+
+        self.apply_theme(self.colors)
+
+    def _line_props(self, style):
+        props = {
+            "main": {"color": self.colors["chart_line"], "linewidth": 1.5, "linestyle": "-", "alpha": 1.0},
+            "ref": {"color": self.colors["chart_axis"], "linewidth": 1.0, "linestyle": "--", "alpha": 0.4},
+            "error": {"color": COLOR_DANGER, "linewidth": 1.0, "linestyle": "-", "alpha": 1.0},
+            "lamp": {"color": COLOR_WARNING, "linewidth": 1.0, "linestyle": "-", "alpha": 1.0},
+            "fan": {"color": "#3498db", "linewidth": 1.0, "linestyle": "-", "alpha": 1.0},
+            "rpm": {"color": "#8e44ad", "linewidth": 1.0, "linestyle": "-", "alpha": 1.0},
+        }
+        return props[style]
+
+    def _apply_limits(self):
+        self._limits_dirty = False
+        for panel in CHART_PANELS:
+            ax = self.axes.get(panel["key"])
+            if ax is not None:
+                ax.set_ylim(*(self._ylim[panel["key"]] or panel["ylim"]))
+                ax.set_xlim(0, self._xlim)
+
+    def _sync_lines(self):
+        for name, line in self.lines.items():
+            line.set_data(self.x, self.series[name])
+
+    def _draw_lines(self):
+        for line in self.lines.values():
+            line.axes.draw_artist(line)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+
+# --- AGENDADOR DE DESENHO ---
+RENDER_FPS = 20  # Teto padrão de quadros por segundo da interface
+RENDER_FPS_OPTIONS = ["10", "20", "30"]
+RENDER_MAX_ROWS = 200  # Linhas inseridas na tabela por quadro; o resto fica para os próximos
+
+
+class RenderScheduler:
+    """Junta os pedidos de redesenho e os executa no máximo 'fps' vezes por segundo.
+
+    Cada parte da tela (cards, tabela, gráfico) é registrada com uma função de
+    desenho e uma de visibilidade. Quem recebe dados só marca a parte como suja; no
+    próximo quadro as partes visíveis são desenhadas e as escondidas continuam sujas
+    até voltarem para a tela (wake). Assim o custo acompanha o teto de quadros e não
+    a taxa da telemetria.
+    """
+
+    def __init__(self, widget, fps=RENDER_FPS):
+        self.widget = widget
+        self.fps = fps
+        self.dirty = set()
+        self._tasks = {}
+        self._job = None
+
+    def register(self, name, render, visible=None):
+        self._tasks[name] = (render, visible)
+
+    def mark(self, name):
+        self.dirty.add(name)
+        self.wake()
+
+    def discard(self, name):
+        self.dirty.discard(name)
+
+    def wake(self):
+        if self.dirty and self._job is None:
+            self._job = self.widget.after(int(1000 / self.fps), self._frame)
+
+    def _frame(self):
+        self._job = None
+        for name in [n for n in self._tasks if n in self.dirty]:
+            render, visible = self._tasks[name]
+            if visible is None or visible():
+                self.dirty.discard(name)
+                render()
+
+
+# --- SEGURANÇA ---
+SAFETY_CFG = {
+    "max_temp": 50.0,  # °C (limite do DHT11); dispara ao atingir
+    "max_temp_hyst": 3.0,  # °C abaixo do limite para rearmar
+    "stuck_time": 300.0,  # s com leitura idêntica enquanto o controle tenta mover a temperatura
+    "stuck_band": 2.0,  # °C de erro (|setpoint - temp|) a partir do qual a leitura deveria mudar
+    "stuck_min_pwm": 128,  # PWM do atuador controlado a partir do qual a leitura deveria mudar
+    "fan_min_pwm": 80,  # PWM a partir do qual a ventoinha precisa girar
+    "fan_stall_time": 3.0,  # s com a ventoinha comandada e 0 RPM
+    "lamp_sat_pwm": 250,  # PWM considerado lâmpada saturada
+    "lamp_sat_time": 120.0,  # s de lâmpada saturada sem subir a temperatura
+    "lamp_min_rise": 0.5,  # °C que a temperatura precisa subir nesse tempo
+}
+
+
+class SafetyMonitor:
+    """Regras de segurança avaliadas a cada amostra, antes de qualquer trabalho de interface.
+
+    Cada regra fica travada depois de disparar e só rearma com histerese
+    (temperatura abaixo do limite menos a histerese, leitura mudando, ventoinha
+    girando, lâmpada saindo da saturação), então um alarme não se repete a cada amostra.
+    """
+
+    def __init__(self, cfg=None):
+        self.cfg = dict(SAFETY_CFG if cfg is None else cfg)
+        self.mode = 0
+        self.reset()
+
+    def reset(self):
+        self.tripped = set()
+        self._stuck_value = None
+        self._stuck_since = None
+        self._stall_since = None
+        self._sat_since = None
+        self._sat_temp = None
+
+    def evaluate(self, t, temp, setpoint, lamp_pwm, fan_pwm, rpm, disturbance=0.0):
+        """Recebe uma amostra e devolve as mensagens dos alarmes que dispararam nela.
+
+        'temp' é a temperatura da telemetria (pidInput = sensor + distúrbio); as regras
+        físicas usam a leitura real do sensor, temp - disturbance.
+        """
+        cfg = self.cfg
+        alarms = []
+        sensor = temp - disturbance
+
+        # 1. Sobretemperatura
+        if sensor >= cfg["max_temp"]:
+            self._trip("sobretemp", f"Sobretemperatura: {sensor:.1f} °C", alarms)
+        elif sensor < cfg["max_temp"] - cfg["max_temp_hyst"]:
+            self.tripped.discard("sobretemp")
+
+        # 2. Sensor travado (DHT devolve a última leitura válida quando falha). O DHT11 anda em
+        # degraus grossos e fica parado por minutos no setpoint, então o tempo só conta com erro
+        # grande e o atuador controlado (no Só Ventilação, só a ventoinha) bem acionado.
+        # O erro é o do PID (com distúrbio); a leitura parada é a do sensor.
+        demand = fan_pwm if self.mode == 2 else max(lamp_pwm, fan_pwm)
+        driving = abs(setpoint - temp) >= cfg["stuck_band"] and demand >= cfg["stuck_min_pwm"]
+        if sensor != self._stuck_value or not driving:
+            self._stuck_value = sensor
+            self._stuck_since = t
+            self.tripped.discard("sensor")
+        elif t - self._stuck_since >= cfg["stuck_time"]:
+            self._trip("sensor", f"Sensor travado em {sensor:.1f} °C há {t - self._stuck_since:.0f} s", alarms)
+
+        # 3. Ventoinha comandada sem girar
+        if fan_pwm >= cfg["fan_min_pwm"] and rpm == 0:
+            if self._stall_since is None:
+                self._stall_since = t
+            elif t - self._stall_since >= cfg["fan_stall_time"]:
+                self._trip("ventoinha", f"Ventoinha comandada ({fan_pwm:.0f} PWM) com 0 RPM", alarms)
+        else:
+            self._stall_since = None
+            self.tripped.discard("ventoinha")
+
+        # 4. Lâmpada saturada sem aquecer (no modo Só Ventilação a lâmpada fica fixa de propósito)
+        if lamp_pwm >= cfg["lamp_sat_pwm"] and self.mode != 2:
+            if self._sat_since is None or sensor - self._sat_temp >= cfg["lamp_min_rise"]:
+                self._sat_since = t
+                self._sat_temp = sensor
+            elif t - self._sat_since >= cfg["lamp_sat_time"]:
+                self._trip("lampada", f"Lâmpada saturada há {t - self._sat_since:.0f} s sem aquecer", alarms)
+        else:
+            self._sat_since = None
+            self.tripped.discard("lampada")
+
+        return alarms
+
+    def _trip(self, rule, message, alarms):
+        if rule not in self.tripped:
+            self.tripped.add(rule)
+            alarms.append(message)
+
+
+# --- RASTREAMENTO DE AMOSTRAS ---
+TRACE_CAPACITY = 65536  # Spans guardados (buffer circular; os mais antigos são sobrescritos)
+
+
+class SampleTracer:
+    """Rastreador opcional das etapas de cada amostra, da leitura serial até o desenho na tela.
+
+    Os spans vão para listas pré-alocadas usadas como buffer circular. Desligado,
+    cada ponto de medição custa só a checagem de self.enabled.
+    """
+
+    # Spans que englobam outras etapas: aparecem no trace, mas não no ranking do resumo
+    GROUP_SPANS = ("process_data",)
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.enabled = False
+        self.capacity = capacity
+        self._names = [None] * capacity
+        self._start = [0] * capacity
+        self._dur = [0] * capacity
+        self._sample = [0] * capacity
+        self._thread = [0] * capacity
+        self.clear()
+
+    def clear(self):
+        for i in range(self.capacity):
+            self._names[i] = None
+        self._slots = itertools.count()  # next() é atômico, então as duas threads podem gravar
+        self._samples = itertools.count(1)
+
+    def now(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def next_sample(self):
+        return next(self._samples) if self.enabled else 0
+
+    def record(self, name, sample, t0):
+        # t0 == 0: o início foi medido com o rastreador ainda desligado
+        if not self.enabled or not t0:
+            return
+        t1 = time.perf_counter_ns()
+        i = next(self._slots) % self.capacity
+        self._names[i] = name
+        self._start[i] = t0
+        self._dur[i] = t1 - t0
+        self._sample[i] = sample
+        self._thread[i] = threading.get_ident()
+
+    def spans(self):
+        idx = [i for i, name in enumerate(self._names) if name is not None]
+        idx.sort(key=self._start.__getitem__)
+        return [(self._names[i], self._start[i], self._dur[i], self._sample[i], self._thread[i]) for i in idx]
+
+    def export_chrome(self, path):
+        """Grava os spans no formato JSON do Chrome (chrome://tracing) / Perfetto."""
+        spans = self.spans()
+        t_base = spans[0][1] if spans else 0
+        main_thread = threading.main_thread().ident
+        events = []
+        for tid in sorted({span[4] for span in spans}):
+            thread_name = "Interface" if tid == main_thread else "Leitura"
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                           "args": {"name": thread_name}})
+        for name, start, dur, sample, tid in spans:
+            events.append({"name": name, "ph": "X", "pid": 1, "tid": tid, "ts": (start - t_base) / 1000,
+                           "dur": dur / 1000, "args": {"amostra": sample}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self, top=5):
+        stages = {}
+        for name, _, dur, _, _ in self.spans():
+            if name not in self.GROUP_SPANS:
+                stages.setdefault(name, []).append(dur)
+        if not stages:
+            return "Nenhum span registrado."
+
+        lines = []
+        ranked = sorted(stages.items(), key=lambda item: sum(item[1]) / len(item[1]), reverse=True)
+        for name, durs in ranked[:top]:
+            durs.sort()
+            mean = sum(durs) / len(durs) / 1e6
+            p95 = durs[int(0.95 * (len(durs) - 1))] / 1e6
+            lines.append(f"{name}: média {mean:.2f} ms, p95 {p95:.2f} ms, máx {durs[-1] / 1e6:.2f} ms "
+                         f"({len(durs)}x)")
+        return "\n".join(lines)
+
+
+# --- REPRODUÇÃO DE SESSÕES ---
+REPLAY_SPEEDS = {"1x": 1.0, "2x": 2.0, "5x": 5.0, "10x": 10.0, "Máx": 0.0}  # 0 = o mais rápido possível
+REPLAY_WINDOW = 64  # Máximo de amostras na fila da interface antes de o replay esperar
+
+
+class SessionReplay:
+    """Reinjeta uma sessão gravada pelo mesmo caminho de leitura da serial.
+
+    Aceita a planilha exportada (xlsx/csv, com os eventos da coluna 'Eventos') ou a
+    captura bruta das linhas 'DADOS' (tempo vindo do millis() do firmware). Cada
+    amostra vira uma linha 'DADOS' com o tempo original da gravação.
+    """
+
+    def __init__(self, frames, speed=1.0):
+        self.frames = frames  # [(tempo_s, linha, evento)]
+        self.speed = speed
+        self.running = False
+        self.sent = 0
+        self.processed = 0
+        self.t_start = None
+        self.t_end = None
+        self._window = threading.BoundedSemaphore(REPLAY_WINDOW)
+
+    @classmethod
+    def from_file(cls, path, speed=1.0):
+        if os.path.splitext(path)[1].lower() in (".xlsx", ".xls"):
+            return cls(cls._frames_from_table(pd.read_excel(path)), speed)
+
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        if any(line.strip().startswith("DADOS") for line in text.splitlines()[:20]):
+            return cls(cls._frames_from_capture(text.splitlines()), speed)
+        return cls(cls._frames_from_table(pd.read_csv(io.StringIO(text), sep=None, engine="python")), speed)
+
+    @staticmethod
+    def _frames_from_table(df):
+        if "Tempo (s)" not in df or "Temperatura (°C)" not in df:
+            raise ValueError("Arquivo sem as colunas 'Tempo (s)' e 'Temperatura (°C)'.")
+
+        def column(name):
+            # Aceita vírgula decimal (CSV salvo pelo Excel em pt-BR); colunas ausentes viram 0
+            if name not in df:
+                return [0.0] * len(df)
+            values = pd.to_numeric(df[name].astype(str).str.replace(',', '.'), errors="coerce")
+            return values.fillna(0.0).astype(float).tolist()  # O Excel devolve 30.0 como inteiro
+
+        events = df["Eventos"].fillna("-").astype(str).tolist() if "Eventos" in df else ["-"] * len(df)
+        rows = zip(column("Tempo (s)"), column("Temperatura (°C)"), column("Setpoint (°C)"),
+                   column("Tensão Lâmpada (V)"), column("Tensão Fan (V)"), column("RPM"), events)
+
+        frames = []
+        for t, temp, setpoint, lamp_v, fan_v, rpm, event in rows:
+            lamp_pwm = round(lamp_v / 12.0 * 255)
+            fan_pwm = round(fan_v / 12.0 * 255)
+            line = f"DADOS,{temp},{setpoint},{lamp_pwm},{fan_pwm},{int(t * 1000)},{int(rpm)}"
+            frames.append((t, line, None if event.strip() in ("", "-") else event))
+        return frames
+
+    @staticmethod
+    def _frames_from_capture(lines):
+        frames = []
+        offset = 0
+        first = None
+        last_ms = None
+        for line in lines:
+            line = line.strip()
+            if not line.startswith("DADOS"):
+                continue
+            try:
+                ms = int(line.split(',')[5])
+            except (IndexError, ValueError):
+                continue
+            # millis() recomeça se a placa resetou no meio da captura
+            if last_ms is not None and ms < last_ms:
+                offset += last_ms
+            last_ms = ms
+            if first is None:
+                first = ms
+            frames.append(((ms + offset - first) / 1000.0, line, None))
+        return frames
+
+    def start(self, emit, schedule, on_finish):
+        """emit(linha, tempo, evento) roda nesta thread; schedule(fn) agenda fn na thread da interface."""
+        self.running = True
+        threading.Thread(target=self._run, args=(emit, schedule, on_finish), daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self, emit, schedule, on_finish):
+        self.t_start = time.perf_counter()
+        first = self.frames[0][0] if self.frames else 0.0
+        for t, line, event in self.frames:
+            if not self.running:
+                break
+            if self.speed > 0:
+                delay = self.t_start + (t - first) / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self._window.acquire()
+            emit(line, t, event)
+            schedule(self._frame_done)
+            self.sent += 1
+
+        # Espera a interface consumir a fila para medir a vazão real do pipeline
+        for _ in range(REPLAY_WINDOW):
+            self._window.acquire()
+        self.t_end = time.perf_counter()
+        self.running = False
+        schedule(on_finish)
+
+    def _frame_done(self):
+        self.processed += 1
+        self._window.release()
+
+    def summary(self):
+        wall = max((self.t_end or time.perf_counter()) - self.t_start, 1e-9)
+        recorded = self.frames[self.processed - 1][0] - self.frames[0][0] if self.processed else 0.0
+        status = "concluída" if self.processed == len(self.frames) else "interrompida"
+        return (f"Reprodução {status}: {self.processed}/{len(self.frames)} amostras em {wall:.2f} s "
+                f"({self.processed / wall:.0f} amostras/s, {recorded / wall:.1f}x o tempo real)")
+
 
 class ThermalControlApp(ctk.CTk):
     def __init__(self):
@@ -42,9 +629,25 @@ class ThermalControlApp(ctk.CTk):
 
         self.current_theme = "Dark"
         self.serial_port = None
+        self.connected_device = None
+        self.usb_id = None  # (VID, PID, nº de série) da placa conectada, para achá-la de novo após uma queda
+        self.active_setpoint = None  # Último SET enviado (reenviado na reconexão)
+        self.active_disturbance = 0.0  # Último DIST aceito pela porta (a telemetria vem somada a ele)
+        self.board_millis = None  # millis() do último quadro da placa (volta para trás se ela reiniciar)
+        self.resync = None  # Ressincronização pendente após reconexão
         self.is_connected = False
         self.monitoring = False  # Variável para controlar se registramos dados ou não
         self.thread = None
+        self.replay = None
+        self.safety = SafetyMonitor()
+        self.tracer = SampleTracer()
+        self.trace_sample = 0  # Amostra em processamento na thread da interface (para os spans)
+
+        # Estado pendente de desenho (o RenderScheduler aplica no próximo quadro)
+        self.render = RenderScheduler(self)
+        self.card_values = None
+        self.card_texts = {}  # Último texto de cada label dos cards
+        self.pending_rows = deque()
         self.start_time = None
         self.last_log_time = 0
         self.active_mode = 0
@@ -63,9 +666,6 @@ class ThermalControlApp(ctk.CTk):
 
         # Dados
         self.full_data_log = []
-        self.display_data_x = []
-        self.display_data_y = []
-        self.display_data_setpoint = []
 
         # Config Janela
         self.withdraw()
@@ -85,6 +685,7 @@ class ThermalControlApp(ctk.CTk):
         self._setup_ui()
         self.apply_theme_colors()
         self._configure_table_columns(1)
+        self.chart.set_mode(1)
 
         self.after(200, self.deiconify)
         self.after(500, self.auto_select_arduino)
@@ -120,7 +721,19 @@ class ThermalControlApp(ctk.CTk):
 
         self.btn_connect = ctk.CTkButton(self.sidebar, text="CONECTAR", command=self.toggle_connection,
                                          fg_color=COLOR_SUCCESS, font=("Roboto", 11, "bold"), height=25)
-        self.btn_connect.pack(pady=(2, 5), padx=15, fill="x")
+        self.btn_connect.pack(pady=(2, 2), padx=15, fill="x")
+
+        # Reprodução de sessão gravada (sem hardware)
+        replay_frame = ctk.CTkFrame(self.sidebar, fg_color="transparent")
+        replay_frame.pack(pady=(0, 5), padx=15, fill="x")
+        self.replay_speed_var = ctk.StringVar(value="1x")
+        self.replay_speed_menu = ctk.CTkOptionMenu(replay_frame, variable=self.replay_speed_var,
+                                                   values=list(REPLAY_SPEEDS), width=60, height=22,
+                                                   font=("Arial", 11))
+        self.replay_speed_menu.pack(side="left")
+        self.btn_replay = ctk.CTkButton(replay_frame, text="REPRODUZIR", command=self.start_replay,
+                                        fg_color="#555555", height=22, font=("Arial", 10))
+        self.btn_replay.pack(side="right", padx=(5, 0), fill="x", expand=True)
 
         self._create_divider()
 
@@ -134,6 +747,13 @@ class ThermalControlApp(ctk.CTk):
         self.entry_interval.pack(side="right")
         self.entry_interval.insert(0, "1.0")
 
+        f_fps = ctk.CTkFrame(self.sidebar, fg_color="transparent")
+        f_fps.pack(pady=1, padx=15, fill="x")
+        ctk.CTkLabel(f_fps, text="Quadros/s:", font=("Arial", 11)).pack(side="left")
+        self.fps_var = ctk.StringVar(value=str(RENDER_FPS))
+        ctk.CTkOptionMenu(f_fps, variable=self.fps_var, values=RENDER_FPS_OPTIONS, command=self.change_render_fps,
+                          width=60, height=22, font=("Arial", 11)).pack(side="right")
+
         f2 = ctk.CTkFrame(self.sidebar, fg_color="transparent")
         f2.pack(pady=1, padx=15, fill="x")
         ctk.CTkLabel(f2, text="Distúrbio (°C):", font=("Arial", 11)).pack(side="left")
@@ -145,6 +765,10 @@ class ThermalControlApp(ctk.CTk):
                                       fg_color="#555555", height=22, font=("Arial", 10))
         self.btn_dist.pack(pady=2, padx=15, fill="x")
 
+        self.switch_trace = ctk.CTkSwitch(self.sidebar, text="Rastrear amostras", command=self.toggle_tracing,
+                                          font=("Arial", 11), height=20)
+        self.switch_trace.pack(pady=2, padx=15, fill="x")
+
         self._create_divider()
 
         # MODO
@@ -214,6 +838,11 @@ class ThermalControlApp(ctk.CTk):
                                           height=25, width=80, font=("Arial", 10, "bold"), state="disabled")
         self.btn_save_img.pack(side="right", padx=(2, 0), expand=True, fill="x")
 
+        self.btn_save_trace = ctk.CTkButton(self.export_grid, text="TRACE", command=self.save_trace,
+                                            fg_color="#555555", hover_color="#444444",
+                                            height=25, width=80, font=("Arial", 10, "bold"), state="disabled")
+        self.btn_save_trace.pack(side="left", padx=2, expand=True, fill="x")
+
         self.btn_stop = ctk.CTkButton(self.bottom_frame, text="PARAR TUDO", command=self.stop_all_monitoring,
                                       fg_color=COLOR_DANGER, hover_color="#962d22",
                                       height=30, font=("Roboto", 11, "bold"))
@@ -238,7 +867,7 @@ class ThermalControlApp(ctk.CTk):
             self.dashboard, "VENTOINHA (12V)", "#3498db", 0, 3)
 
         # Tabs
-        self.tab_view = ctk.CTkTabview(self.dashboard)
+        self.tab_view = ctk.CTkTabview(self.dashboard, command=self.render.wake)
         self.tab_view.grid(row=1, column=0, columnspan=4, sticky="nsew", pady=(5, 0))
 
         # AUMENTO AGRESSIVO DA LARGURA DAS ABAS (Correção aqui)
@@ -257,6 +886,11 @@ class ThermalControlApp(ctk.CTk):
         self.tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
+        # Cards sempre visíveis; tabela e gráfico só desenham com a aba aberta
+        self.render.register("cards", self.render_cards)
+        self.render.register("table", self.render_table, lambda: self.tab_view.get() == "Tabela")
+        self.render.register("plot", self.render_plot, lambda: self.tab_view.get() == "Gráfico")
+
     # --- AJUSTE DINÂMICO DE COLUNAS ---
     def _configure_table_columns(self, mode):
         for col in self.tree["columns"]:
@@ -283,12 +917,13 @@ class ThermalControlApp(ctk.CTk):
     def change_control_mode(self, choice):
         if not self.check_connection(): return
 
-        map_modes = {"Automático (Ambos)": 0, "Só Aquecimento": 1, "Só Ventilação": 2}
-        self.active_mode = map_modes.get(choice, 0)
+        self.active_mode = CONTROL_MODES.get(choice, 0)
         self._configure_table_columns(self.active_mode)
+        self.chart.set_mode(self.active_mode)
+        self.safety.mode = self.active_mode
 
         # Envia modo ao Arduino
-        self.serial_port.write(f"MODE:{self.active_mode}\n".encode())
+        self.send_command(f"MODE:{self.active_mode}")
 
         if self.active_mode == 2:  # Só Ventilação
             # Resetamos a confirmação para obrigar o usuário a dar "OK" novamente
@@ -309,47 +944,8 @@ class ThermalControlApp(ctk.CTk):
             self.base_heat_confirmed = True  # Nos outros modos, não precisa confirmar lâmpada
 
     def update_plot(self):
-        colors = THEME_CFG[self.current_theme]
-        self.ax.clear()
-
-        self.ax.set_xlabel("Tempo (s)", color=colors["chart_axis"])
-        self.ax.set_ylabel("Temperatura (°C)", color=colors["chart_axis"])
-
-        self.ax.plot(self.display_data_x, self.display_data_y, color=colors["chart_line"], linewidth=1.5, label='Temp')
-        self.ax.plot(self.display_data_x, self.display_data_setpoint, color=colors["chart_axis"], linestyle='--',
-                     alpha=0.4, label='Set')
-
-        if self.display_data_y:
-            # Pega o MÍNIMO REAL dos dados coletados (ex: 28.5)
-            y_min_data = min(self.display_data_y)
-            y_max_data = max(self.display_data_y)
-
-            # Considera o setpoint na escala também
-            if self.display_data_setpoint:
-                y_min_total = min(y_min_data, min(self.display_data_setpoint))
-                y_max_total = max(y_max_data, max(self.display_data_setpoint))
-            else:
-                y_min_total = y_min_data
-                y_max_total = y_max_data
-
-            # Garante uma margem de visualização de +/- 1 grau
-            self.ax.set_ylim(y_min_total - 1, y_max_total + 1)
-
-        else:
-            # Se não tem dados ainda, mostra uma escala "Aguardando..." (ex: 20 a 30)
-            # NÃO MOSTRA 0
-            self.ax.set_ylim(20, 30)
-
-        self.ax.grid(True, linestyle=':', color=colors["chart_grid"], alpha=0.5)
-        self.ax.set_facecolor(colors["chart_bg"])
-        self.ax.spines['bottom'].set_color(colors["chart_axis"])
-        self.ax.spines['left'].set_color(colors["chart_axis"])
-        self.ax.tick_params(colors=colors["chart_axis"])
-
-        legend = self.ax.legend(loc='upper right', facecolor=colors["panel"], labelcolor=colors["chart_axis"],
-                                framealpha=0, fontsize=8)
-
-        self.canvas.draw()
+        # Um único passe de blit por quadro (redesenho completo só quando a escala cresce)
+        self.chart.refresh()
 
     def parse_float(self, val_str):
         if not val_str: return None
@@ -358,21 +954,75 @@ class ThermalControlApp(ctk.CTk):
         except:
             return None
 
-    def process_data(self, data):
+    def parse_frame(self, data):
         try:
-            # 1. Leitura
             temp = float(data[1])
             setpoint = float(data[2])
             lamp_pwm = float(data[3])
             fan_pwm = float(data[4])
+            millis = int(data[5])
             rpm = int(data[6]) if len(data) > 6 else 0
+        except (IndexError, ValueError) as e:
+            print(f"Erro processamento: {e}")
+            return None
+        return temp, setpoint, lamp_pwm, fan_pwm, rpm, millis
+
+    def ingest_line(self, line, timestamp=None, event=None, sample=None):
+        # Caminho comum da serial e do replay (roda na thread produtora)
+        if not line.startswith("DADOS"):
+            return
+        tr = self.tracer
+        if sample is None:
+            sample = tr.next_sample()
+
+        t0 = tr.now()
+        frame = self.parse_frame(line.split(','))
+        tr.record("parse", sample, t0)
+        if frame is None:
+            return
+
+        # Segurança antes de qualquer trabalho de interface: o STOP sai nesta mesma amostra
+        temp, setpoint, lamp_pwm, fan_pwm, rpm, _ = frame
+        now = time.time() if timestamp is None else timestamp
+        t0 = tr.now()
+        alarms = self.safety.evaluate(now, temp, setpoint, lamp_pwm, fan_pwm, rpm, self.active_disturbance)
+        tr.record("seguranca", sample, t0)
+        if alarms:
+            self.send_stop_now()
+
+        self.after(0, self.process_data, frame, timestamp, event, alarms, sample, tr.now())
+
+    def process_data(self, frame, timestamp=None, event=None, alarms=None, sample=0, t_queued=0):
+        tr = self.tracer
+        tr.record("fila", sample, t_queued)
+        self.trace_sample = sample
+        t_start = tr.now()
+        try:
+            # Marcadores vindos de uma sessão reproduzida
+            if event:
+                self.add_event_marker(event)
+
+            # 1. Leitura
+            temp, setpoint, lamp_pwm, fan_pwm, rpm, millis = frame
 
             lamp_v = (lamp_pwm / 255.0) * 12.0
             fan_v = (fan_pwm / 255.0) * 12.0
 
-            # Atualiza variável de validação e Cards (sempre visíveis)
+            current_t = time.time() if timestamp is None else timestamp
+
+            if alarms:
+                self.handle_alarms(alarms, current_t, temp, setpoint, lamp_v, fan_v, rpm)
+
+            # Atualiza variável de validação e Cards (desenhados no próximo quadro)
             self.last_read_temp = temp
-            self.update_cards(temp, setpoint, lamp_pwm, fan_pwm, rpm, lamp_v, fan_v)
+            self.card_values = (temp, setpoint, lamp_pwm, fan_pwm, rpm, lamp_v, fan_v)
+            self.render.mark("cards")
+
+            # Quadros da placa (não do replay): conferem a ressincronização pendente
+            if timestamp is None:
+                if self.resync is not None and self.is_connected:
+                    self.check_resync(setpoint, millis)
+                self.board_millis = millis
 
             # --- FILTROS DE GRAVAÇÃO ---
 
@@ -386,13 +1036,10 @@ class ThermalControlApp(ctk.CTk):
 
             # --- GRAVAÇÃO ---
 
-            current_t = time.time()
-            elapsed_time = current_t - self.start_time
-
             interval_setting = self.parse_float(self.entry_interval.get())
             if interval_setting is None or interval_setting < 0.1: interval_setting = 1.0
 
-            if (current_t - self.last_log_time) >= interval_setting:
+            if (current_t - self.last_log_time) >= interval_setting - LOG_INTERVAL_TOLERANCE:
                 self.last_log_time = current_t
 
                 current_event = "-"
@@ -400,34 +1047,87 @@ class ThermalControlApp(ctk.CTk):
                     current_event = self.next_event_marker
                     self.next_event_marker = ""
 
-                log_entry = {
-                    "Tempo (s)": round(elapsed_time, 2),
-                    "Temperatura (°C)": temp,
-                    "Setpoint (°C)": setpoint,
-                    "Tensão Lâmpada (V)": round(lamp_v, 2),
-                    "Tensão Fan (V)": round(fan_v, 2),
-                    "RPM": rpm,
-                    "Eventos": current_event,
-                    "Data/Hora": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                self.full_data_log.append(log_entry)
-
-                vals = [f"{elapsed_time:.1f}", f"{temp:.1f}", f"{setpoint:.1f}", f"{lamp_v:.1f}"]
-                if self.active_mode != 1:
-                    vals.append(f"{fan_v:.1f}")
-                    vals.append(f"{rpm}")
-                vals.append(current_event)
-
-                self.tree.insert("", "0", values=tuple(vals))
-
-                self.display_data_x.append(elapsed_time)
-                self.display_data_y.append(temp)
-                self.display_data_setpoint.append(setpoint)
-
-                self.update_plot()
+                self.log_sample(current_t - self.start_time, temp, setpoint, lamp_v, fan_v, rpm, current_event)
 
         except Exception as e:
             print(f"Erro processamento: {e}")
+        finally:
+            tr.record("process_data", sample, t_start)
+
+    def log_sample(self, elapsed_time, temp, setpoint, lamp_v, fan_v, rpm, event):
+        log_entry = {
+            "Tempo (s)": round(elapsed_time, 2),
+            "Temperatura (°C)": temp,
+            "Setpoint (°C)": setpoint,
+            "Tensão Lâmpada (V)": round(lamp_v, 2),
+            "Tensão Fan (V)": round(fan_v, 2),
+            "RPM": rpm,
+            "Eventos": event,
+            "Data/Hora": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.full_data_log.append(log_entry)
+
+        vals = [f"{elapsed_time:.1f}", f"{temp:.1f}", f"{setpoint:.1f}", f"{lamp_v:.1f}"]
+        if self.active_mode != 1:
+            vals.append(f"{fan_v:.1f}")
+            vals.append(f"{rpm}")
+        vals.append(event)
+
+        self.pending_rows.append(tuple(vals))
+        self.render.mark("table")
+
+        self.chart.append(elapsed_time, temp, setpoint, lamp_v, fan_v, rpm)
+        self.render.mark("plot")
+
+    def render_cards(self):
+        tr = self.tracer
+        t0 = tr.now()
+        self.update_cards(*self.card_values)
+        tr.record("update_cards", self.trace_sample, t0)
+
+    def render_table(self):
+        tr = self.tracer
+        t0 = tr.now()
+        # Fila acumulada com a aba escondida entra aos poucos, sem travar a interface
+        for _ in range(min(RENDER_MAX_ROWS, len(self.pending_rows))):
+            self.tree.insert("", "0", values=self.pending_rows.popleft())
+        if self.pending_rows:
+            self.render.mark("table")
+        tr.record("tabela.insert", self.trace_sample, t0)
+
+    def render_plot(self):
+        tr = self.tracer
+        t0 = tr.now()
+        self.update_plot()
+        tr.record("grafico.desenho", self.trace_sample, t0)
+
+    def add_event_marker(self, text):
+        # Junta ao marcador pendente com " | ", sem repetir um evento que já está nele
+        # (ex.: linha de alarme gravada que dispara a mesma regra no replay)
+        parts = self.next_event_marker.split(" | ") if self.next_event_marker else []
+        for part in text.split(" | "):
+            if part not in parts:
+                parts.append(part)
+        self.next_event_marker = " | ".join(parts)
+
+    def change_render_fps(self, choice):
+        self.render.fps = int(choice)
+
+    def handle_alarms(self, alarms, current_t, temp, setpoint, lamp_v, fan_v, rpm):
+        # O STOP já foi enviado pela thread de leitura; aqui registramos e travamos a interface
+        event = "ALARME: " + "; ".join(alarms)
+        print(event)
+        self.add_event_marker(event)
+        event = self.next_event_marker
+        self.next_event_marker = ""
+
+        # A linha do alarme entra no registro mesmo fora do intervalo de gravação
+        if self.monitoring and self.start_time is not None:
+            self.last_log_time = current_t
+            self.log_sample(current_t - self.start_time, temp, setpoint, lamp_v, fan_v, rpm, event)
+
+        self.stop_all_monitoring()
+        self.show_alert("ALARME DE SEGURANÇA", "Sistema desligado (STOP).\n\n" + "\n".join(alarms), True)
 
     def save_to_excel(self):
         if not self.full_data_log: return
@@ -466,13 +1166,8 @@ class ThermalControlApp(ctk.CTk):
                     child.configure(text_color=colors["text_dim"])
 
         self._style_treeview()
-        if hasattr(self, 'fig'):
-            self.fig.patch.set_facecolor(colors["panel"])
-            self.ax.set_facecolor(colors["chart_bg"])
-            self.ax.spines['bottom'].set_color(colors["chart_axis"])
-            self.ax.spines['left'].set_color(colors["chart_axis"])
-            self.ax.tick_params(colors=colors["chart_axis"])
-            self.canvas.draw()
+        if hasattr(self, 'chart'):
+            self.chart.apply_theme(colors)
 
     def _style_treeview(self):
         style = ttk.Style()
@@ -534,51 +1229,50 @@ class ThermalControlApp(ctk.CTk):
         return e
 
     def _init_matplotlib(self):
-        self.fig = Figure(figsize=(5, 4), dpi=100)
-        self.ax = self.fig.add_subplot(111)
-        self.ax.spines['top'].set_visible(False)
-        self.ax.spines['right'].set_visible(False)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.graph_container)
-        self.canvas.draw()
+        self.chart = StripChart(self.graph_container)
+        self.fig = self.chart.fig
+        self.canvas = self.chart.canvas
         self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
 
     def send_heartbeat(self):
-        if self.is_connected and self.serial_port:
-            try:
-                self.serial_port.write(b"PING\n")
-            except:
-                pass
-        self.after(1000, self.send_heartbeat)
+        if self.is_connected:
+            self.send_command("PING")
+        self.after(int(HEARTBEAT_INTERVAL * 1000), self.send_heartbeat)
 
     def update_cards(self, temp, setpoint, lamp_pwm, fan_pwm, rpm, lamp_v, fan_v):
         lamp_pct = int((lamp_pwm / 255) * 100)
         fan_pct = int((fan_pwm / 255) * 100)
-        self.val_temp.configure(text=f"{temp:.1f} °C")
-        self.val_set.configure(text=f"{setpoint:.1f} °C")
-        self.lbl_lamp_pct.configure(text=f"{lamp_pct}%")
-        self.lbl_lamp_volts.configure(text=f"{lamp_v:.1f} V")
-        self.lbl_fan_pct.configure(text=f"{fan_pct}%")
-        self.lbl_fan_volts.configure(text=f"{fan_v:.1f} V")
-        self.lbl_fan_rpm.configure(text=f"{rpm} RPM")
+        self._set_card_text(self.val_temp, f"{temp:.1f} °C")
+        self._set_card_text(self.val_set, f"{setpoint:.1f} °C")
+        self._set_card_text(self.lbl_lamp_pct, f"{lamp_pct}%")
+        self._set_card_text(self.lbl_lamp_volts, f"{lamp_v:.1f} V")
+        self._set_card_text(self.lbl_fan_pct, f"{fan_pct}%")
+        self._set_card_text(self.lbl_fan_volts, f"{fan_v:.1f} V")
+        self._set_card_text(self.lbl_fan_rpm, f"{rpm} RPM")
+
+    def _set_card_text(self, label, text):
+        # Só reconfigura o label se o texto exibido mudou
+        if self.card_texts.get(label) != text:
+            self.card_texts[label] = text
+            label.configure(text=text)
 
     def toggle_connection(self):
+        if self.replay:
+            return  # A thread do replay ainda está drenando; finish_replay libera o botão
         if not self.serial_port:
             try:
-                self.serial_port = serial.Serial(self.com_menu.get(), 115200, timeout=1)
+                self.connected_device = self.com_menu.get()
+                self.serial_port = serial.Serial(self.connected_device, 115200, timeout=1)
+                self.usb_id = self.get_usb_id(self.connected_device)
                 self.is_connected = True
                 self.monitoring = True
                 self.start_time = time.time()
 
-                # Limpa dados anteriores
-                self.full_data_log = []
-                self.display_data_x = []
-                self.display_data_y = []
-                self.display_data_setpoint = []
-                for item in self.tree.get_children():
-                    self.tree.delete(item)
+                self._reset_session()
 
                 # Botão fica desabilitado e cinza indicando sucesso
                 self.btn_connect.configure(text="SISTEMA CONECTADO", fg_color="#555555", state="disabled")
+                self.btn_replay.configure(state="disabled")
 
                 # --- TRAVAMENTO IMEDIATO DO INTERVALO ---
                 # Garante que desde o primeiro milissegundo o intervalo seja fixo
@@ -596,33 +1290,113 @@ class ThermalControlApp(ctk.CTk):
             except Exception as e:
                 self.show_alert("FALHA", str(e), True)
 
+    def _reset_session(self):
+        # Limpa dados anteriores
+        self.full_data_log = []
+        self.last_log_time = float("-inf")
+        self.next_event_marker = ""
+        self.active_setpoint = None
+        self.active_disturbance = 0.0
+        self.board_millis = None
+        self.resync = None
+        self.safety.reset()
+        self.chart.reset()
+        self.update_plot()
+        self.render.discard("plot")
+        self.pending_rows = deque()
+        self.render.discard("table")
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+
+    def start_replay(self):
+        if self.serial_port or self.replay:
+            self.show_alert("Atenção", "Pare a sessão atual antes de reproduzir uma gravação.", True)
+            return
+
+        filename = filedialog.askopenfilename(filetypes=[("Sessão gravada", "*.xlsx *.csv *.txt *.log"),
+                                                         ("Todos", "*.*")])
+        if not filename: return
+        try:
+            replay = SessionReplay.from_file(filename, REPLAY_SPEEDS[self.replay_speed_var.get()])
+        except Exception as e:
+            self.show_alert("FALHA", str(e), True)
+            return
+        if not replay.frames:
+            self.show_alert("FALHA", "Nenhuma amostra encontrada no arquivo.", True)
+            return
+
+        # Mesmo modo selecionado na interface (define colunas da tabela e canais do gráfico)
+        self.active_mode = CONTROL_MODES.get(self.mode_var.get(), 0)
+        self._configure_table_columns(self.active_mode)
+        self.chart.set_mode(self.active_mode)
+        self.safety.mode = self.active_mode
+
+        self._reset_session()
+        self.start_time = 0.0  # Os tempos da gravação já são relativos ao início
+        self.monitoring = True
+
+        self.btn_connect.configure(state="disabled")
+        self.btn_replay.configure(state="disabled", text="REPRODUZINDO...")
+        self.mode_menu.configure(state="disabled")
+        self.entry_interval.configure(state="disabled")
+        self.btn_save_excel.configure(state="disabled")
+        self.btn_save_img.configure(state="disabled")
+
+        self.replay = replay
+        replay.start(self.ingest_line, lambda fn: self.after(0, fn), self.finish_replay)
+
+    def finish_replay(self):
+        replay = self.replay
+        if replay is None: return
+        self.replay = None
+
+        summary = replay.summary()
+        print(summary)
+        if self.serial_port:
+            # Uma porta real já está aberta: só devolve o botão do replay
+            self.btn_replay.configure(state="disabled", text="REPRODUZIR")
+        else:
+            self.close_serial()
+        self.show_alert("REPRODUÇÃO", summary, False)
+
     # CORREÇÃO PONTO 2 e 3: Função de Parada Total
     def stop_all_monitoring(self):
         # 1. Envia comando STOP para desligar componentes fisicos
-        if self.serial_port:
-            try:
-                self.serial_port.write(b"STOP\n")
-            except:
-                pass
+        self.send_stop_now()
 
-        # 2. Para de registrar dados
+        # 2. Para de registrar dados (e interrompe um replay em andamento)
         self.monitoring = False
+        if self.replay:
+            self.replay.stop()
 
         # 3. Fecha a conexão serial (Resetando a interface para permitir reconexão)
         self.close_serial()
 
+    def send_stop_now(self):
+        # Pode ser chamado da thread de leitura (alarme) ou da interface
+        port = self.serial_port
+        if port:
+            try:
+                port.write(b"STOP\n")
+            except:
+                pass
+
     def close_serial(self):
         self.is_connected = False
         self.monitoring = False
-        if self.serial_port:
+        port = self.serial_port
+        self.serial_port = None
+        if port:
             try:
-                self.serial_port.close()
+                port.close()
             except:
                 pass
-        self.serial_port = None
 
-        # Restaura botão CONECTAR
-        self.btn_connect.configure(text="CONECTAR", fg_color=COLOR_SUCCESS, state="normal")
+        # Restaura botão CONECTAR (só depois que a thread do replay terminar de drenar)
+        self.btn_connect.configure(text="CONECTAR", fg_color=COLOR_SUCCESS,
+                                   state="disabled" if self.replay else "normal")
+        self.btn_replay.configure(state="disabled" if self.replay else "normal",
+                                  text="REPRODUZINDO..." if self.replay else "REPRODUZIR")
 
         # --- DESBLOQUEIA CAMPOS ---
         self.entry_setpoint.configure(state="normal")
@@ -644,16 +1418,137 @@ class ThermalControlApp(ctk.CTk):
         while self.is_connected and self.serial_port:
             try:
                 if self.serial_port.in_waiting:
+                    tr = self.tracer
+                    t0 = tr.now()
                     line = self.serial_port.readline().decode('utf-8', errors='ignore').strip()
-                    if line.startswith("DADOS"):
-                        self.after(0, self.process_data, line.split(','))
+                    sample = tr.next_sample()
+                    tr.record("serial.leitura", sample, t0)
+                    self.ingest_line(line, sample=sample)
+            except (serial.SerialException, OSError):
+                # Porta caiu (cabo USB): reabre sem encerrar a sessão
+                if self.is_connected:
+                    self.reconnect_serial()
             except:
                 pass
 
+    def open_serial(self, device):
+        # DTR/RTS baixos antes de abrir para não disparar o auto-reset do Arduino
+        port = serial.Serial()
+        port.port = device
+        port.baudrate = 115200
+        port.timeout = 1
+        port.dtr = False
+        port.rts = False
+        port.open()
+        return port
+
+    def reconnect_serial(self):
+        # Roda na thread de leitura até reabrir a porta ou o usuário parar
+        lost_port = self.serial_port
+        self.serial_port = None
+        t_lost = time.time()
+        try:
+            lost_port.close()
+        except:
+            pass
+
+        print("Conexão perdida. Procurando a placa...")
+        self.after(0, lambda: self.btn_connect.configure(text="RECONECTANDO...", fg_color=COLOR_WARNING))
+
+        while self.is_connected:
+            device = self.find_arduino_port(self.usb_id, self.connected_device)
+            if device:
+                try:
+                    port = self.open_serial(device)
+                except (serial.SerialException, OSError):
+                    port = None
+                if port:
+                    if not self.is_connected:
+                        port.close()
+                        return
+                    # O tempo da queda não pode contar nos temporizadores de sensor travado/ventoinha
+                    self.safety.reset()
+                    self.serial_port = port
+
+                    # PARAR TUDO pode ter chegado entre a checagem e a publicação da porta
+                    if not self.is_connected:
+                        if self.serial_port is port:
+                            self.serial_port = None
+                        port.close()
+                        return
+                    self.after(0, self.resync_after_reconnect, device, time.time() - t_lost)
+                    return
+            time.sleep(RECONNECT_POLL)
+
+    def resync_after_reconnect(self, device, gap):
+        if not self.is_connected or not self.serial_port: return
+        self.connected_device = device
+        self.com_port_var.set(device)
+        self.btn_connect.configure(text="RESSINCRONIZANDO...", fg_color=COLOR_WARNING)
+
+        # Nada é enviado às cegas: o primeiro quadro da placa diz se ela perdeu o estado (check_resync).
+        # Numa falha curta ela segue rodando e MODE/PID zerariam o integral; depois de um
+        # power cycle os comandos cairiam na janela do bootloader.
+        self.resync = {"gap": gap, "millis": self.board_millis, "sent_at": None, "reset": False}
+        print(f"Reconectado em {device} após {gap:.1f} s. Aguardando telemetria...")
+
+    def check_resync(self, setpoint, millis):
+        rs = self.resync
+        target = self.active_setpoint
+        setpoint_ok = target is None or abs(setpoint - target) <= RESYNC_SETPOINT_TOL
+
+        if rs["sent_at"] is None:
+            # Primeiro quadro após reabrir: millis voltando para trás = a placa reiniciou
+            rs["reset"] = rs["millis"] is not None and millis < rs["millis"]
+            if not rs["reset"] and setpoint_ok:
+                # Estado preservado; se a lacuna pode ter disparado o watchdog, só o SET
+                # reativa as saídas (ele não mexe no integral)
+                if target is not None and rs["gap"] + HEARTBEAT_INTERVAL >= FIRMWARE_WATCHDOG:
+                    self.send_command(f"SET:{target}")
+                self.finish_resync()
+                return
+        elif setpoint_ok:
+            self.finish_resync()
+            return
+        elif time.time() - rs["sent_at"] < RESYNC_RETRY:
+            return
+
+        # A placa perdeu o estado: reenvia tudo até a telemetria mostrar o setpoint de volta
+        rs["sent_at"] = time.time()
+        self.send_command(f"MODE:{self.active_mode}")
+        if self.active_mode == 2 and self.base_heat_confirmed:
+            self.send_and_lock_base(lock=False)
+        self.send_disturbance()
+        self.validate_and_send_pid()
+        if target is None:
+            self.finish_resync()  # Nenhum SET enviado ainda: não há o que confirmar
+        else:
+            self.send_command(f"SET:{target}")
+
+    def finish_resync(self):
+        rs = self.resync
+        self.resync = None
+        self.btn_connect.configure(text="SISTEMA CONECTADO", fg_color="#555555")
+
+        marker = f"RECONEXÃO (lacuna {rs['gap']:.1f} s{', placa reiniciada' if rs['reset'] else ''})"
+        self.add_event_marker(marker)
+        print(f"Ressincronizado: {marker}")
+
+    def send_command(self, command):
+        # Copia a porta para um local: a thread de leitura pode trocá-la a qualquer momento (reconexão)
+        port = self.serial_port
+        if not port:
+            return False
+        try:
+            port.write(f"{command}\n".encode())
+            return True
+        except (serial.SerialException, OSError):
+            return False  # Porta caiu; a thread de leitura cuida da reconexão
+
     def send_disturbance(self):
         val = self.parse_float(self.entry_dist.get())
-        if self.serial_port and val is not None:
-            self.serial_port.write(f"DIST:{val}\n".encode())
+        if val is not None and self.send_command(f"DIST:{val}"):
+            self.active_disturbance = val
 
     def send_and_lock_base(self, lock=True):
         val_f = self.parse_float(self.entry_base_heat.get())
@@ -672,8 +1567,7 @@ class ThermalControlApp(ctk.CTk):
 
             # Envia ao Arduino
             val_pwm = int((val_f / 100.0) * 255)
-            if self.serial_port:
-                self.serial_port.write(f"BASE:{val_pwm}\n".encode())
+            if self.send_command(f"BASE:{val_pwm}"):
                 print(f"Lâmpada Base enviada: {val_pwm} PWM")  # Debug
 
             # Se foi confirmado pelo botão, trava e valida
@@ -713,27 +1607,27 @@ class ThermalControlApp(ctk.CTk):
                 return
 
         # 4. INÍCIO DO PROCESSO COM DELAY
-        if self.serial_port:
-            # RE-ENVIO DE SEGURANÇA (Garante o modo no Arduino)
-            self.serial_port.write(f"MODE:{self.active_mode}\n".encode())
-            time.sleep(0.1)
+        # RE-ENVIO DE SEGURANÇA (Garante o modo no Arduino)
+        self.send_command(f"MODE:{self.active_mode}")
+        time.sleep(0.1)
 
-            # Envia Setpoint
-            self.serial_port.write(f"SET:{val}\n".encode())
+        # Envia Setpoint (se a porta cair aqui, a reconexão reenvia o SET guardado)
+        self.send_command(f"SET:{val}")
+        self.active_setpoint = val
 
-            # --- BLOQUEIOS DE INTERFACE (SEGURANÇA TOTAL) ---
-            self.entry_setpoint.configure(state="disabled")
-            self.mode_menu.configure(state="disabled")  # <--- BLOQUEIA A MUDANÇA DE MODO
+        # --- BLOQUEIOS DE INTERFACE (SEGURANÇA TOTAL) ---
+        self.entry_setpoint.configure(state="disabled")
+        self.mode_menu.configure(state="disabled")  # <--- BLOQUEIA A MUDANÇA DE MODO
 
-            # Bloqueia também os controles da lâmpada base se estiverem visíveis
-            self.entry_base_heat.configure(state="disabled")
-            self.btn_conf_base.configure(state="disabled")
+        # Bloqueia também os controles da lâmpada base se estiverem visíveis
+        self.entry_base_heat.configure(state="disabled")
+        self.btn_conf_base.configure(state="disabled")
 
-            self.btn_set.configure(state="disabled", fg_color=COLOR_WARNING, text="ESTABILIZANDO (2s)...")
+        self.btn_set.configure(state="disabled", fg_color=COLOR_WARNING, text="ESTABILIZANDO (2s)...")
 
-            self.next_event_marker = f"INICIO (Set: {val})"
+        self.add_event_marker(f"INICIO (Set: {val})")
 
-            self.after(2000, self.enable_monitoring_delayed)
+        self.after(2000, self.enable_monitoring_delayed)
 
     def enable_monitoring_delayed(self):
         # Ativa a gravação de dados após os 2 segundos
@@ -745,29 +1639,73 @@ class ThermalControlApp(ctk.CTk):
         print("Monitoramento iniciado após estabilização.")
 
     def validate_and_send_pid(self):
-        if self.serial_port:
-            kp = self.parse_float(self.entry_kp.get())
-            ki = self.parse_float(self.entry_ki.get())
-            kd = self.parse_float(self.entry_kd.get())
-            if kp is not None:
-                self.serial_port.write(f"PID:{kp}:{ki}:{kd}\n".encode())
-                self.lbl_current_pid.configure(text=f"PID: {kp}/{ki}/{kd}")
+        kp = self.parse_float(self.entry_kp.get())
+        ki = self.parse_float(self.entry_ki.get())
+        kd = self.parse_float(self.entry_kd.get())
+        if kp is not None and self.send_command(f"PID:{kp}:{ki}:{kd}"):
+            self.lbl_current_pid.configure(text=f"PID: {kp}/{ki}/{kd}")
+
+    def toggle_tracing(self):
+        if self.switch_trace.get():
+            self.tracer.clear()
+            self.tracer.enabled = True
+            self.btn_save_trace.configure(state="normal")
+        else:
+            self.tracer.enabled = False
+
+    def save_trace(self):
+        f = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome Trace", "*.json")])
+        if f:
+            try:
+                self.tracer.export_chrome(f)
+                summary = self.tracer.summary()
+                print(summary)
+                self.show_alert("TRACE", f"Trace salvo (abra em ui.perfetto.dev).\n\nEtapas mais lentas:\n{summary}",
+                                False)
+            except Exception as e:
+                self.show_alert("ERRO", str(e), True)
 
     def save_graph_image(self):
         if self.full_data_log:
             f = filedialog.asksaveasfilename(defaultextension=".png")
             if f:
-                self.fig.savefig(f)
+                self.chart.save(f)
 
     def get_com_ports(self):
         ports = serial.tools.list_ports.comports()
         return [port.device for port in ports] if ports else ["Nenhuma Porta"]
 
     def auto_select_arduino(self):
+        device = self.find_arduino_port()
+        if device:
+            self.com_port_var.set(device)
+
+    def find_arduino_port(self, usb_id=None, device=None):
+        # Com usb_id procura a mesma placa (o SO pode trocar o nome da porta ao reconectar);
+        # sem ele, cai no nome da porta anterior ou na primeira placa reconhecida
+        ports = serial.tools.list_ports.comports()
+        if usb_id:
+            vid, pid, serial_number = usb_id
+            for port in ports:
+                if port.vid == vid and port.pid == pid and (not serial_number or port.serial_number == serial_number):
+                    return port.device
+            return None
+        if device:
+            return device if any(port.device == device for port in ports) else None
+
+        for port in ports:
+            if any(port.vid == vid and pid in (None, port.pid) for vid, pid in ARDUINO_USB_IDS):
+                return port.device
+            description = (port.description or "").lower()
+            if "arduino" in description or "ch340" in description:
+                return port.device
+        return None
+
+    def get_usb_id(self, device):
         for port in serial.tools.list_ports.comports():
-            if "arduino" in port.description.lower() or "ch340" in port.description.lower():
-                self.com_port_var.set(port.device)
-                break
+            if port.device == device and port.vid is not None:
+                return port.vid, port.pid, port.serial_number
+        return None
 
     def check_connection(self):
         if not self.serial_port: